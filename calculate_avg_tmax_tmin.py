@@ -1,11 +1,15 @@
 from pathlib import Path
 import csv
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from itertools import repeat
 from datetime import datetime, date
-import statistics
 import calendar
+import sys
 from wsgiref import headers
 
+from parse_cache import READ_BUFFER_SIZE, cached_parse
+
 
 SPLIT_DIR = Path('split')
 TMIN_DIR = SPLIT_DIR / 'tmin'
@@ -13,6 +17,9 @@ TMAX_DIR = SPLIT_DIR / 'tmax'
 OUT_FILE = Path('monthly_avgs.csv')
 RECENT_CUTOFF = date(2025, 10, 1)
 OLD_CUTOFF = date(2000, 10, 1)
+# cutoffs as year * 12 + month so month groups compare as plain ints
+RECENT_MONTH_INDEX = RECENT_CUTOFF.year * 12 + RECENT_CUTOFF.month
+OLD_MONTH_INDEX = OLD_CUTOFF.year * 12 + OLD_CUTOFF.month
 
 # period labels and ordering
 PERIODS = ['all', '<2000', '2026']
@@ -22,6 +29,11 @@ WINTER_MONTHS = [10, 11, 12, 1, 2, 3]
 MONTH_ORDER = {m: i for i, m in enumerate(WINTER_MONTHS)}
 
 AVG_OUT_DIR = SPLIT_DIR / 'avg-temp'
+MONTH_ABBR = list(calendar.month_abbr)
+# same terminator csv.writer uses, so rewritten files stay byte-identical
+CSV_LINE_END = '\r\n'
+# per-station output files are independent, so they are written from a small thread pool
+WRITE_WORKERS = 8
 
 AVG_MONTHLY_DIR = Path('average-temp-data') / 'monthly'
 AVG_YEARLY_DIR = Path('average-temp-data') / 'yearly'
@@ -44,24 +56,45 @@ def normalize_display_name(full_name: str) -> str:
 	return ' '.join(w.title() for w in chosen)
 
 
-def read_station_file(path: Path):
-	"""Yield tuples (station_id, station_display, year, month, value) from a TMIN/TMAX CSV file."""
-	with path.open(newline='') as fh:
+def write_csv_lines(path: Path, header: str, lines):
+	"""Write a header plus pre-joined CSV lines in one call; fields must not need quoting."""
+	with path.open('w', newline='') as fh:
+		fh.write(CSV_LINE_END.join([header, *lines]) + CSV_LINE_END)
+
+
+def write_csv_files(files):
+	"""Write (path, header, lines) CSV files concurrently; lines must already be materialized."""
+	# stations sharing a display name map to the same path; keep only the last
+	# job per path so two threads never write one file (last one wins, as when written serially)
+	jobs = {f[0]: f for f in files}
+	with ThreadPoolExecutor(max_workers=WRITE_WORKERS) as ex:
+		# consume the results so errors from any worker are raised here
+		list(ex.map(lambda f: write_csv_lines(*f), jobs.values()))
+
+
+def read_station_file(path: Path, datatype: str):
+	"""Yield tuples (station_id, station_name, year, month, value) for one datatype from a TMIN/TMAX CSV file."""
+	with path.open(newline='', buffering=READ_BUFFER_SIZE) as fh:
 		reader = csv.reader(fh)
 		try:
-			header = next(reader)
+			next(reader)
 		except StopIteration:
 			return
 		for row in reader:
-			if len(row) < 6:
+			# check the datatype before unpacking or parsing anything
+			if len(row) < 6 or row[3] != datatype:
 				continue
-			station_id, station_name, dt, datatype, value, attributes = row[:6]
+			station_id, station_name, dt, _, value = row[:5]
+			# only a handful of stations repeat across every row; intern so keys share one object
+			station_id = sys.intern(station_id)
+			station_name = sys.intern(station_name)
 			try:
 				d = datetime.fromisoformat(dt).date()
-			except Exception:
+			except ValueError:
+				# fall back to the leading YYYY-MM-DD for odd timestamp suffixes
 				try:
-					d = datetime.strptime(dt.split('T')[0], '%Y-%m-%d').date()
-				except Exception:
+					d = date.fromisoformat(dt[:10])
+				except ValueError:
 					continue
 			try:
 				val = float(value)
@@ -70,109 +103,111 @@ def read_station_file(path: Path):
 			yield station_id, station_name, d.year, d.month, val
 
 
+def season_keys(sy):
+	"""Return the (year, month) keys for Nov/Dec of season year sy and Jan of sy + 1."""
+	return ((sy, 11), (sy, 12), (sy + 1, 1))
+
+
+def season_avg(ym_map, keys):
+	"""Return rounded (avg_max, avg_min) over the monthly averages at keys, '' where there is no data."""
+	maxs = []
+	mins = []
+	for k in keys:
+		v = ym_map.get(k)
+		if v is None:
+			continue
+		avg_max, avg_min = v
+		if avg_max is not None:
+			maxs.append(avg_max)
+		if avg_min is not None:
+			mins.append(avg_min)
+	return (
+		round(sum(maxs) / len(maxs)) if maxs else '',
+		round(sum(mins) / len(mins)) if mins else '',
+	)
+
+
+def summarize_station_file(path: Path, datatype: str):
+	"""Return ({(station_id, year, month): [sum, count]}, {station_id: station_name}) for one TMIN/TMAX CSV file."""
+	sums = defaultdict(lambda: [0.0, 0])
+	names = {}
+	for station_id, station_name, y, m, val in read_station_file(path, datatype):
+		entry = sums[(station_id, y, m)]
+		entry[0] += val
+		entry[1] += 1
+		if station_id not in names:
+			names[station_id] = station_name
+	# plain dict so the result can be pickled back from a worker process
+	return dict(sums), names
+
+
 def gather():
-	tmin = defaultdict(list)
-	tmax = defaultdict(list)
-	station_display_cache = {}
+	# running [sum, count] per key so samples are never retained
+	tmin = defaultdict(lambda: [0.0, 0])
+	tmax = defaultdict(lambda: [0.0, 0])
 
-	tmin_monthly = defaultdict(lambda: defaultdict(lambda: defaultdict(list)))
-	tmax_monthly = defaultdict(lambda: defaultdict(lambda: defaultdict(list)))
+	# keyed by (station_id, year, month)
+	tmin_monthly = defaultdict(lambda: [0.0, 0])
+	tmax_monthly = defaultdict(lambda: [0.0, 0])
 	station_years = defaultdict(set)
 
 	# normalize station name
 	station_display_by_id = {}
 
-	def add_record_for_periods(station_name, d, val, store):
-		disp = station_display_cache.get(station_name)
-		if not disp:
-			disp = normalize_display_name(station_name)
-			station_display_cache[station_name] = disp
-		m = d.month
-		# most recent winter
-		if d >= RECENT_CUTOFF:
-			key = (disp, m, '2026')
-			store[key].append(val)
-			return
-		# otherwise it's part of 'all'
-		key_all = (disp, m, 'all')
-		store[key_all].append(val)
-		# and also may be part of '<2000'
-		if d < OLD_CUTOFF:
-			key_old = (disp, m, '<2000')
-			store[key_old].append(val)
-
-	# process temp min files
-	if TMIN_DIR.exists():
-		for p in TMIN_DIR.glob('*.csv'):
-			with p.open(newline='') as fh:
-				reader = csv.reader(fh)
-				try:
-					next(reader)
-				except StopIteration:
-					continue
-				for row in reader:
-					if len(row) < 6:
-						continue
-					station_id, station_name, dt, datatype, value, attributes = row[:6]
-					if datatype != 'TMIN':
-						continue
-					try:
-						d = datetime.fromisoformat(dt).date()
-					except Exception:
-						try:
-							d = datetime.strptime(dt.split('T')[0], '%Y-%m-%d').date()
-						except Exception:
-							continue
-					try:
-						valf = float(value)
-					except Exception:
-						continue
-					add_record_for_periods(station_name, d, valf, tmin)
-					tmin_monthly[station_id][d.year][d.month].append(valf)
-					station_years[station_id].add(d.year)
-					# store normalized display name for this station id
-					station_display_by_id[station_id] = station_display_cache.get(station_name) or normalize_display_name(station_name)
-
-	# process temp max files
-	if TMAX_DIR.exists():
-		for p in TMAX_DIR.glob('*.csv'):
-			with p.open(newline='') as fh:
-				reader = csv.reader(fh)
-				try:
-					next(reader)
-				except StopIteration:
-					continue
-				for row in reader:
-					if len(row) < 6:
-						continue
-					station_id, station_name, dt, datatype, value, attributes = row[:6]
-					if datatype != 'TMAX':
-						continue
-					try:
-						d = datetime.fromisoformat(dt).date()
-					except Exception:
-						try:
-							d = datetime.strptime(dt.split('T')[0], '%Y-%m-%d').date()
-						except Exception:
-							continue
-					try:
-						valf = float(value)
-					except Exception:
-						continue
-					add_record_for_periods(station_name, d, valf, tmax)
-					tmax_monthly[station_id][d.year][d.month].append(valf)
-					station_years[station_id].add(d.year)
-					station_display_by_id[station_id] = station_display_cache.get(station_name) or normalize_display_name(station_name)
+	def add_monthly_for_periods(monthly, store):
+		# both cutoffs fall on the first of a month, so every day in a month shares one period
+		for (station_id, y, m), (total, count) in monthly.items():
+			station_years[station_id].add(y)
+			# only winter months make it into the period rows
+			if m not in MONTH_ORDER:
+				continue
+			disp = station_display_by_id[station_id]
+			month_index = y * 12 + m
+			# most recent winter
+			if month_index >= RECENT_MONTH_INDEX:
+				periods = ('2026',)
+			# otherwise it's part of 'all' and may also be part of '<2000'
+			elif month_index < OLD_MONTH_INDEX:
+				periods = ('all', '<2000')
+			else:
+				periods = ('all',)
+			for period in periods:
+				entry = store[(disp, m, period)]
+				entry[0] += total
+				entry[1] += count
+
+	def merge_station_parts(parts, monthly):
+		for sums, names in parts:
+			for key, (total, count) in sums.items():
+				entry = monthly[key]
+				entry[0] += total
+				entry[1] += count
+			# store normalized display name once per station id
+			for station_id, station_name in names.items():
+				if station_id not in station_display_by_id:
+					station_display_by_id[station_id] = normalize_display_name(station_name)
+
+	tmin_paths = sorted(TMIN_DIR.glob('*.csv')) if TMIN_DIR.exists() else []
+	tmax_paths = sorted(TMAX_DIR.glob('*.csv')) if TMAX_DIR.exists() else []
+
+	# station files are independent, so summarize them in parallel and merge here
+	with ProcessPoolExecutor() as ex:
+		tmin_parts = ex.map(cached_parse, repeat(summarize_station_file), tmin_paths, repeat('TMIN'))
+		tmax_parts = ex.map(cached_parse, repeat(summarize_station_file), tmax_paths, repeat('TMAX'))
+		merge_station_parts(tmin_parts, tmin_monthly)
+		merge_station_parts(tmax_parts, tmax_monthly)
+
+	# bucket the monthly groups into periods
+	add_monthly_for_periods(tmin_monthly, tmin)
+	add_monthly_for_periods(tmax_monthly, tmax)
 
 	rows = []
-	keys = set(list(tmin.keys()) + list(tmax.keys()))
-	for (disp, m, period) in keys:
-		if m not in WINTER_MONTHS:
-			continue
-		min_vals = tmin.get((disp, m, period), [])
-		max_vals = tmax.get((disp, m, period), [])
-		avg_min = round(statistics.mean(min_vals)) if min_vals else ''
-		avg_max = round(statistics.mean(max_vals)) if max_vals else ''
+	for key in tmin.keys() | tmax.keys():
+		disp, m, period = key
+		min_entry = tmin.get(key)
+		max_entry = tmax.get(key)
+		avg_min = round(min_entry[0] / min_entry[1]) if min_entry else ''
+		avg_max = round(max_entry[0] / max_entry[1]) if max_entry else ''
 		rows.append((m, disp, period, avg_min, avg_max))
 
 	# sort
@@ -182,23 +217,17 @@ def gather():
 	# compute monthly averages per station
 	monthly_avgs = defaultdict(dict)
 
-	for station_id in set(list(tmin_monthly.keys()) + list(tmax_monthly.keys())):
-		ym_keys = set()
-		for y in tmin_monthly.get(station_id, {}):
-			for m in tmin_monthly[station_id][y]:
-				ym_keys.add((y, m))
-		for y in tmax_monthly.get(station_id, {}):
-			for m in tmax_monthly[station_id][y]:
-				ym_keys.add((y, m))
-		for (y, m) in ym_keys:
-			min_vals = tmin_monthly.get(station_id, {}).get(y, {}).get(m, [])
-			max_vals = tmax_monthly.get(station_id, {}).get(y, {}).get(m, [])
-			avg_min = round(statistics.mean(min_vals)) if min_vals else None
-			avg_max = round(statistics.mean(max_vals)) if max_vals else None
-			monthly_avgs[station_id][(y, m)] = (avg_max, avg_min)
+	for key in tmin_monthly.keys() | tmax_monthly.keys():
+		station_id, y, m = key
+		min_entry = tmin_monthly.get(key)
+		max_entry = tmax_monthly.get(key)
+		avg_min = round(min_entry[0] / min_entry[1]) if min_entry else None
+		avg_max = round(max_entry[0] / max_entry[1]) if max_entry else None
+		monthly_avgs[station_id][(y, m)] = (avg_max, avg_min)
 
 	# monthly CSVs
 	AVG_MONTHLY_DIR.mkdir(parents=True, exist_ok=True)
+	monthly_files = []
 	for station_id, ym_map in monthly_avgs.items():
 		years = station_years.get(station_id, set())
 		if not years:
@@ -218,17 +247,16 @@ def gather():
 		# normalize filename
 		fname = disp.replace(' ', '') + '.csv'
 		outpath = AVG_MONTHLY_DIR / fname
-		with outpath.open('w', newline='') as fh:
-			writer = csv.writer(fh)
-			writer.writerow(['year', 'month', 'station', 'avgMaxTemp', 'avgMinTemp'])
-			for season_year, _, y, m, avg_max, avg_min in out_rows:
-				if avg_max is None and avg_min is None:
-					continue
-				month_abbr = calendar.month_abbr[m]
-				writer.writerow([y, month_abbr, disp, avg_max if avg_max is not None else '', avg_min if avg_min is not None else ''])
+		monthly_files.append((outpath, 'year,month,station,avgMaxTemp,avgMinTemp', [
+			f"{y},{MONTH_ABBR[m]},{disp},{avg_max if avg_max is not None else ''},{avg_min if avg_min is not None else ''}"
+			for season_year, _, y, m, avg_max, avg_min in out_rows
+			if avg_max is not None or avg_min is not None
+		]))
+	write_csv_files(monthly_files)
 
 	# yearly csv's with Nov-Jan avg
 	AVG_YEARLY_DIR.mkdir(parents=True, exist_ok=True)
+	yearly_files = []
 	for station_id, ym_map in monthly_avgs.items():
 		years = station_years.get(station_id, set())
 		if not years:
@@ -244,157 +272,78 @@ def gather():
 		disp = station_display_by_id.get(station_id, station_id)
 		fname = disp.replace(' ', '') + '.csv'
 		outpath = AVG_YEARLY_DIR / fname
-		with outpath.open('w', newline='') as fh:
-			writer = csv.writer(fh)
-			writer.writerow(['year', 'station', 'avgMaxTemp', 'avgMinTemp'])
-			for sy in season_years:
-				parts_max = []
-				parts_min = []
-				v = ym_map.get((sy, 11))
-				if v:
-					if v[0] is not None:
-						parts_max.append(v[0])
-					if v[1] is not None:
-						parts_min.append(v[1])
-				# Dec of sy
-				v = ym_map.get((sy, 12))
-				if v:
-					if v[0] is not None:
-						parts_max.append(v[0])
-					if v[1] is not None:
-						parts_min.append(v[1])
-				# Jan of sy+1
-				v = ym_map.get((sy + 1, 1))
-				if v:
-					if v[0] is not None:
-						parts_max.append(v[0])
-					if v[1] is not None:
-						parts_min.append(v[1])
-				if not parts_max and not parts_min:
-					continue
-				avg_max = round(statistics.mean(parts_max)) if parts_max else ''
-				avg_min = round(statistics.mean(parts_min)) if parts_min else ''
-				writer.writerow([sy, disp, avg_max, avg_min])
-
-		AGG_DIR = Path('analysis') / 'aggregated-avg-temp'
-		AGG_DIR.mkdir(parents=True, exist_ok=True)
-
-		all_path = AGG_DIR / 'average-temps-all.csv'
-		pre2000_path = AGG_DIR / 'average-temps-pre-2000.csv'
-
-		with all_path.open('w', newline='') as f_all, pre2000_path.open('w', newline='') as f_pre:
-			w_all = csv.writer(f_all)
-			w_pre = csv.writer(f_pre)
-			w_all.writerow(['station', 'avgMax', 'avgMin'])
-			w_pre.writerow(['station', 'avgMax', 'avgMin'])
-
-			rows_all = []
-			rows_pre = []
-
-			for station_id, ym_map in monthly_avgs.items():
-				disp = station_display_by_id.get(station_id, station_id)
-				season_years = set()
-				for (y, m) in ym_map.keys():
-					if m in (11, 12):
-						season_years.add(y)
-					elif m == 1:
-						season_years.add(y - 1)
-
-				# through 2025 average
-				parts_max_all = []
-				parts_min_all = []
-				for sy in season_years:
-					if sy >= 2025:
-						continue
-
-					v = ym_map.get((sy, 11))
-					if v:
-						if v[0] is not None:
-							parts_max_all.append(v[0])
-						if v[1] is not None:
-							parts_min_all.append(v[1])
-
-					v = ym_map.get((sy, 12))
-					if v:
-						if v[0] is not None:
-							parts_max_all.append(v[0])
-						if v[1] is not None:
-							parts_min_all.append(v[1])
-
-					v = ym_map.get((sy + 1, 1))
-					if v:
-						if v[0] is not None:
-							parts_max_all.append(v[0])
-						if v[1] is not None:
-							parts_min_all.append(v[1])
-
-				avg_max_all = round(statistics.mean(parts_max_all)) if parts_max_all else ''
-				avg_min_all = round(statistics.mean(parts_min_all)) if parts_min_all else ''
-				rows_all.append((disp, avg_max_all, avg_min_all))
-
-				# through 2000 average
-				parts_max_pre = []
-				parts_min_pre = []
-				for sy in season_years:
-					if sy >= 2000:
-						continue
-					v = ym_map.get((sy, 11))
-					if v:
-						if v[0] is not None:
-							parts_max_pre.append(v[0])
-						if v[1] is not None:
-							parts_min_pre.append(v[1])
-					v = ym_map.get((sy, 12))
-					if v:
-						if v[0] is not None:
-							parts_max_pre.append(v[0])
-						if v[1] is not None:
-							parts_min_pre.append(v[1])
-					v = ym_map.get((sy + 1, 1))
-					if v:
-						if v[0] is not None:
-							parts_max_pre.append(v[0])
-						if v[1] is not None:
-							parts_min_pre.append(v[1])
-
-				avg_max_pre = round(statistics.mean(parts_max_pre)) if parts_max_pre else ''
-				avg_min_pre = round(statistics.mean(parts_min_pre)) if parts_min_pre else ''
-				rows_pre.append((disp, avg_max_pre, avg_min_pre))
-
-			# sort by station
-			rows_all.sort(key=lambda r: r[0].lower())
-			rows_pre.sort(key=lambda r: r[0].lower())
-			for r in rows_all:
-				w_all.writerow(r)
-			for r in rows_pre:
-				w_pre.writerow(r)
-
-		return rows
+		lines = []
+		for sy in season_years:
+			avg_max, avg_min = season_avg(ym_map, season_keys(sy))
+			if avg_max == '' and avg_min == '':
+				continue
+			lines.append(f'{sy},{disp},{avg_max},{avg_min}')
+		yearly_files.append((outpath, 'year,station,avgMaxTemp,avgMinTemp', lines))
+	write_csv_files(yearly_files)
+
+	# aggregated csv's across all stations, written once after the per-station files
+	AGG_DIR = Path('analysis') / 'aggregated-avg-temp'
+	AGG_DIR.mkdir(parents=True, exist_ok=True)
+
+	all_path = AGG_DIR / 'average-temps-all.csv'
+	pre2000_path = AGG_DIR / 'average-temps-pre-2000.csv'
+
+	with all_path.open('w', newline='') as f_all, pre2000_path.open('w', newline='') as f_pre:
+		w_all = csv.writer(f_all)
+		w_pre = csv.writer(f_pre)
+		w_all.writerow(['station', 'avgMax', 'avgMin'])
+		w_pre.writerow(['station', 'avgMax', 'avgMin'])
+
+		rows_all = []
+		rows_pre = []
+
+		for station_id, ym_map in monthly_avgs.items():
+			disp = station_display_by_id.get(station_id, station_id)
+			season_years = set()
+			for (y, m) in ym_map.keys():
+				if m in (11, 12):
+					season_years.add(y)
+				elif m == 1:
+					season_years.add(y - 1)
+
+			# through 2025 average
+			avg_max_all, avg_min_all = season_avg(ym_map, (k for sy in season_years if sy < 2025 for k in season_keys(sy)))
+			rows_all.append((disp, avg_max_all, avg_min_all))
+
+			# through 2000 average
+			avg_max_pre, avg_min_pre = season_avg(ym_map, (k for sy in season_years if sy < 2000 for k in season_keys(sy)))
+			rows_pre.append((disp, avg_max_pre, avg_min_pre))
+
+		# sort by station
+		rows_all.sort(key=lambda r: r[0].lower())
+		rows_pre.sort(key=lambda r: r[0].lower())
+		w_all.writerows(rows_all)
+		w_pre.writerows(rows_pre)
+
+	return rows
 
 
 def write_output(rows):
 	AVG_OUT_DIR.mkdir(parents=True, exist_ok=True)
 
-	with OUT_FILE.open('w', newline='') as fh:
-		writer = csv.writer(fh)
-		writer.writerow(['station', 'month', 'year', 'avgMin', 'avgMax'])
-		for m, disp, period, avg_min, avg_max in rows:
-			month_abbr = calendar.month_abbr[m]
-			writer.writerow([disp, month_abbr, period, avg_min, avg_max])
+	write_csv_lines(OUT_FILE, 'station,month,year,avgMin,avgMax', (
+		f'{disp},{MONTH_ABBR[m]},{period},{avg_min},{avg_max}'
+		for m, disp, period, avg_min, avg_max in rows
+	))
 
 	per_station = {}
 	for m, disp, period, avg_min, avg_max in rows:
 		per_station.setdefault(disp, []).append((m, period, avg_min, avg_max))
 
+	station_files = []
 	for disp, entries in per_station.items():
 		fname = disp.lower().replace(' ', '-') + '.csv'
 		outpath = AVG_OUT_DIR / fname
-		with outpath.open('w', newline='') as fh:
-			writer = csv.writer(fh)
-			writer.writerow(['station', 'month', 'year', 'avgMin', 'avgMax'])
-			for m, period, avg_min, avg_max in entries:
-				month_abbr = calendar.month_abbr[m]
-				writer.writerow([disp, month_abbr, period, avg_min, avg_max])
+		station_files.append((outpath, 'station,month,year,avgMin,avgMax', [
+			f'{disp},{MONTH_ABBR[m]},{period},{avg_min},{avg_max}'
+			for m, period, avg_min, avg_max in entries
+		]))
+	write_csv_files(station_files)
 
 
 def main():
@@ -1,7 +1,12 @@
 import os
 import csv
+import heapq
 from datetime import datetime
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+from parse_cache import READ_BUFFER_SIZE, cached_parse
 
 
 TARGET_MONTHS = [10, 11, 12, 1, 2, 3]
@@ -29,63 +34,45 @@ ANALYSIS_BASE = os.path.join(BASE_DIR, "analysis")
 
 def compute_winter_avgs(monthly_avgs):
 	winter_avgs = {}
-	years = {y for (y, m) in monthly_avgs.keys()}
-	candidate_years = set()
-	for (y, m) in monthly_avgs.keys():
-		if m in (11, 12):
-			candidate_years.add(y)
-		if m == 1:
-			candidate_years.add(y - 1)
-
-	for winter in sorted(candidate_years):
-		key_nov = (winter, 11)
-		key_dec = (winter, 12)
-		key_jan = (winter + 1, 1)
-		if key_nov in monthly_avgs and key_dec in monthly_avgs and key_jan in monthly_avgs:
-			vals = [monthly_avgs[key_nov], monthly_avgs[key_dec], monthly_avgs[key_jan]]
-			winter_avgs[winter] = sum(vals) / len(vals)
+	# a winter needs its November, so start from those keys in a single pass
+	for (winter, m), v_nov in monthly_avgs.items():
+		if m != 11:
+			continue
+		v_dec = monthly_avgs.get((winter, 12))
+		v_jan = monthly_avgs.get((winter + 1, 1))
+		if v_dec is not None and v_jan is not None:
+			winter_avgs[winter] = (v_nov + v_dec + v_jan) / 3
 
 	return winter_avgs
 
 
-def generate_analysis_for_dir(in_dir, is_high=True):
-	kind = "high" if is_high else "low"
-	series_dir = os.path.join(ANALYSIS_BASE, f"{ 'high' if is_high else 'low' }-temp")
-	ensure_dir(series_dir)
-	all_rows = []
+def write_station_series(station_name, sorted_items, series_out, is_high):
+	"""Write one station's winter-average series, warmest winter first."""
+	ensure_dir(os.path.dirname(series_out))
+	with open(series_out, 'w', newline='', encoding='utf-8') as sf:
+		writer = csv.writer(sf)
+		writer.writerow(["year", "station", f"avg{ 'High' if is_high else 'Low' }Temp"])
+		fmt = "{:.2f}".format
+		writer.writerows([(year, station_name, fmt(avg)) for year, avg in sorted_items])
 
-	for fname in sorted(os.listdir(in_dir)):
-		if not fname.lower().endswith('.csv'):
-			continue
-		in_path = os.path.join(in_dir, fname)
-		station_basename = os.path.splitext(fname)[0]
-		station_name, avgs = process_station_file(in_path)
-		winter_avgs = compute_winter_avgs(avgs)
-
-		series_out = os.path.join(series_dir, f"{station_basename}.csv")
-		ensure_dir(os.path.dirname(series_out))
-		with open(series_out, 'w', newline='', encoding='utf-8') as sf:
-			writer = csv.writer(sf)
-			writer.writerow(["year", "station", f"avg{ 'High' if is_high else 'Low' }Temp"])
-			for year, avg in sorted(winter_avgs.items(), key=lambda t: t[1], reverse=True):
-				writer.writerow([year, station_name, f"{avg:.2f}"])
-
-		if winter_avgs:
-			sorted_items = sorted(winter_avgs.items(), key=lambda t: t[1], reverse=True)
-			top_val = sorted_items[0][1]
-			for idx, (year, avg) in enumerate(sorted_items, start=1):
-				degrees = round(top_val - avg, 2)
-				all_rows.append((station_name, year, idx, degrees))
 
+def write_winter_ranking(results, is_high=True):
+	"""Write the combined warmest-winter ranking from (station_name, sorted_items) pairs."""
 	ranking_file = os.path.join(ANALYSIS_BASE, f"warmest-winter-{ 'high' if is_high else 'low' }-ranking.csv")
 	ensure_dir(os.path.dirname(ranking_file))
-	all_rows.sort(key=lambda r: (r[0].lower(), r[2]))
+	# each station's items are already in rank order, so ordering the stations
+	# by name is enough to write the ranking without collecting every row
+	results.sort(key=lambda r: r[0].lower())
 	with open(ranking_file, 'w', newline='', encoding='utf-8') as rf:
 		writer = csv.writer(rf)
 		writer.writerow(["year", "station", "ranking", "degreesBelowTop"])
-		for sname, year, idx, degrees in all_rows:
-			writer.writerow([year, sname, idx, degrees])
-
+		write = writer.writerow
+		for station_name, sorted_items in results:
+			if not sorted_items:
+				continue
+			top_val = sorted_items[0][1]
+			for idx, (year, avg) in enumerate(sorted_items, start=1):
+				write([year, station_name, idx, round(top_val - avg, 2)])
 
 
 def ensure_dir(path):
@@ -94,105 +81,171 @@ def ensure_dir(path):
 
 def process_station_file(in_path):
 	"""Read a station CSV and return station_name and a dict of (year,month)->avg_value."""
-	groups = defaultdict(list)
+	# running [sum, count] per (year, month)
+	groups = defaultdict(lambda: [0.0, 0])
+	# only (year, month) is needed, so memoize on the YYYY-MM prefix
+	ym_cache = {}
 	station_name = None
-	with open(in_path, newline="", encoding="utf-8") as f:
-		reader = csv.DictReader(f)
+	with open(in_path, newline="", encoding="utf-8", buffering=READ_BUFFER_SIZE) as f:
+		reader = csv.reader(f)
+		header = next(reader, [])
+		if "date" not in header or "value" not in header:
+			return station_name or os.path.splitext(os.path.basename(in_path))[0], {}
+		# index columns once from the header instead of building a dict per row
+		i_date = header.index("date")
+		i_val = header.index("value")
+		name_col = "station_name" if "station_name" in header else "station"
+		i_name = header.index(name_col) if name_col in header else None
+		min_len = max(i_date, i_val) + 1
+		# rows arrive in date order, so sum the current month in locals and
+		# only touch groups when the month changes
+		cur_prefix = None
+		cur_ym = None
+		cur_sum = 0.0
+		cur_count = 0
 		for row in reader:
-			if not station_name:
-				station_name = row.get("station_name") or row.get("station") or ""
-			date_s = row.get("date")
-			val_s = row.get("value")
-			if not date_s or val_s in (None, ""):
+			if len(row) < min_len:
+				continue
+			if not station_name and i_name is not None and i_name < len(row):
+				station_name = row[i_name]
+			date_s = row[i_date]
+			val_s = row[i_val]
+			if not date_s or not val_s:
 				continue
-			try:
-				if "T" in date_s:
-					dt = datetime.fromisoformat(date_s)
-				else:
-					dt = datetime.strptime(date_s, "%Y-%m-%d")
-			except Exception:
-				try:
-					parts = date_s.split("T")[0].split("-")
-					dt = datetime(int(parts[0]), int(parts[1]), int(parts[2]))
-				except Exception:
-					continue
 			try:
 				val = float(val_s)
 			except Exception:
 				continue
-			groups[(dt.year, dt.month)].append(val)
+			prefix = date_s[:7]
+			if prefix == cur_prefix:
+				cur_sum += val
+				cur_count += 1
+				continue
+			ym = ym_cache.get(prefix)
+			if ym is None:
+				try:
+					# covers both plain YYYY-MM-DD and NOAA's YYYY-MM-DDTHH:MM:SS
+					dt = datetime.fromisoformat(date_s[:19])
+				except ValueError:
+					continue
+				ym = ym_cache[prefix] = (dt.year, dt.month)
+			if cur_count:
+				entry = groups[cur_ym]
+				entry[0] += cur_sum
+				entry[1] += cur_count
+			cur_prefix = prefix
+			cur_ym = ym
+			cur_sum = val
+			cur_count = 1
+		if cur_count:
+			entry = groups[cur_ym]
+			entry[0] += cur_sum
+			entry[1] += cur_count
 
 	# calculate averages
-	avgs = {}
-	for (y, m), vals in groups.items():
-		if vals:
-			avgs[(y, m)] = sum(vals) / len(vals)
+	avgs = {ym: total / count for ym, (total, count) in groups.items()}
 	return station_name or os.path.splitext(os.path.basename(in_path))[0], avgs
 
 
+def partition_by_month(avgs):
+	"""Group a (year, month)->avg dict into month->[(year, avg), ...], keeping dict order."""
+	by_month = defaultdict(list)
+	for (y, m), avg in avgs.items():
+		by_month[m].append((y, avg))
+	return by_month
+
+
 def write_ranked_output(avgs, station_name, out_path, value_field_name):
+	by_month = partition_by_month(avgs)
+	fmt = "{:.2f}".format
 	rows = []
 	for month in TARGET_MONTHS:
-		items = [(y, m, avg) for (y, m), avg in avgs.items() if m == month]
-		items.sort(key=lambda t: t[2], reverse=True)
-		top = items[:20]
-		for y, m, avg in top:
-			rows.append((y, m, station_name, avg))
+		# TARGET_MONTHS are all calendar months, so the label always exists
+		label = MONTH_LABELS[month]
+		top = heapq.nlargest(20, by_month.get(month, []), key=lambda t: t[1])
+		rows.extend([(y, label, station_name, fmt(avg)) for y, avg in top])
 
 	ensure_dir(os.path.dirname(out_path))
 	with open(out_path, "w", newline="", encoding="utf-8") as f:
 		writer = csv.writer(f)
 		header = ["year", "month", "stationName", value_field_name]
 		writer.writerow(header)
-		for y, m, sname, avg in rows:
-			month_label = MONTH_LABELS.get(m, str(m))
-			writer.writerow([y, month_label, sname, f"{avg:.2f}"])
+		# rows are already formatted and in column order
+		writer.writerows(rows)
 
 
 def write_year_tiers(avgs, station_name, out_path, which):
 	check_months = [10, 11, 12, 1]
 	target_year_for_month = {10: 2025, 11: 2025, 12: 2025, 1: 2026}
 
+	by_month = partition_by_month(avgs)
 	rows = []
 	for m in check_months:
-		items = [(y, mm, avg) for (y, mm), avg in avgs.items() if mm == m]
+		items = by_month.get(m)
 		if not items:
 			rows.append((target_year_for_month[m], MONTH_LABELS.get(m, str(m)), station_name, "", ""))
 			continue
-		items.sort(key=lambda t: t[2], reverse=True)
-		top_value = items[0][2]
+		top_value = max(avg for _, avg in items)
 		target_year = target_year_for_month[m]
+		target_avg = avgs.get((target_year, m))
 		ranking = ""
 		degrees = ""
-		for idx, (y, mm, avg) in enumerate(items, start=1):
-			if y == target_year:
-				ranking = idx
-				degrees = round(top_value - avg, 2)
-				break
+		if target_avg is not None:
+			# count warmer years instead of sorting; ties ahead of the target year
+			# keep it behind them, matching a stable descending sort
+			ranking = 1
+			before_target = True
+			for y, avg in items:
+				if y == target_year:
+					before_target = False
+				elif avg > target_avg or (before_target and avg == target_avg):
+					ranking += 1
+			degrees = round(top_value - target_avg, 2)
 		rows.append((target_year, MONTH_LABELS.get(m, str(m)), station_name, ranking, degrees))
 
 	ensure_dir(os.path.dirname(out_path))
 	with open(out_path, "w", newline="", encoding="utf-8") as f:
 		writer = csv.writer(f)
 		writer.writerow(["year", "month", "station", "ranking", "degreesBelowTop"])
-		for year, month_label, sname, ranking, degrees in rows:
-			writer.writerow([year, month_label, sname, ranking, degrees])
+		# rows are already in column order
+		writer.writerows(rows)
+
+
+def process_station_output(in_path, out_dir, value_field_name):
+	"""Write the ranked, year-tier and winter series CSVs for one station file.
+
+	Returns (station_name, [(year, winter_avg), ...]) warmest first for the combined ranking.
+	"""
+	station_basename = os.path.splitext(os.path.basename(in_path))[0]
+	is_high = value_field_name == "avgHighTemp"
+	# parse once and feed every output from the same monthly averages
+	station_name, avgs = cached_parse(process_station_file, in_path)
+	out_path = os.path.join(out_dir, f"{station_basename}.csv")
+	write_ranked_output(avgs, station_name, out_path, value_field_name)
+	tiers_base = os.path.join(YEAR_TIERS_BASE, "high" if is_high else "low")
+	ensure_dir(tiers_base)
+	tiers_out_path = os.path.join(tiers_base, f"{station_basename}.csv")
+	write_year_tiers(avgs, station_name, tiers_out_path, "high" if is_high else "low")
+
+	winter_avgs = compute_winter_avgs(avgs)
+	# one sort serves both the series file and the combined ranking;
+	# equal averages rank the earlier winter first whatever the file's row order
+	sorted_items = sorted(winter_avgs.items(), key=lambda t: (-t[1], t[0]))
+	series_out = os.path.join(ANALYSIS_BASE, "high-temp" if is_high else "low-temp", f"{station_basename}.csv")
+	write_station_series(station_name, sorted_items, series_out, is_high)
+	return station_name, sorted_items
 
 
 def process_directory(in_dir, out_dir, value_field_name):
 	ensure_dir(out_dir)
-	for fname in sorted(os.listdir(in_dir)):
-		if not fname.lower().endswith(".csv"):
-			continue
-		in_path = os.path.join(in_dir, fname)
-		station_basename = os.path.splitext(fname)[0]
-		station_name, avgs = process_station_file(in_path)
-		out_path = os.path.join(out_dir, f"{station_basename}.csv")
-		write_ranked_output(avgs, station_name, out_path, value_field_name)
-		tiers_base = os.path.join(YEAR_TIERS_BASE, "high" if value_field_name == "avgHighTemp" else "low")
-		ensure_dir(tiers_base)
-		tiers_out_path = os.path.join(tiers_base, f"{station_basename}.csv")
-		write_year_tiers(avgs, station_name, tiers_out_path, "high" if value_field_name == "avgHighTemp" else "low")
+	ensure_dir(os.path.join(ANALYSIS_BASE, "high-temp" if value_field_name == "avgHighTemp" else "low-temp"))
+	with os.scandir(in_dir) as it:
+		entries = sorted((e for e in it if e.name.lower().endswith(".csv")), key=lambda e: e.name)
+	in_paths = [e.path for e in entries]
+	# stations are independent, so parse and write them in parallel
+	with ProcessPoolExecutor() as ex:
+		results = list(ex.map(process_station_output, in_paths, repeat(out_dir), repeat(value_field_name)))
+	write_winter_ranking(results, is_high=value_field_name == "avgHighTemp")
 
 
 def main():
@@ -209,11 +262,6 @@ def main():
 	else:
 		print(f"TMIN directory not found: {TMIN_DIR}")
 
-	if os.path.isdir(TMAX_DIR):
-		generate_analysis_for_dir(TMAX_DIR, is_high=True)
-	if os.path.isdir(TMIN_DIR):
-		generate_analysis_for_dir(TMIN_DIR, is_high=False)
-
 
 if __name__ == "__main__":
 	main()
@@ -1,7 +1,9 @@
+import csv
 import requests
+import threading
 import time
-import pandas as pd
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 import os
 from pathlib import Path
 import argparse
@@ -19,27 +21,63 @@ HEADERS = {"token": NOAA_TOKEN} if NOAA_TOKEN else {}
 DATASET_ID = "GHCND"
 DATATYPES = ["TMAX", "TMIN", "PRCP", "SNOW", "SNWD"]  # temp max/min, precipitation, snow depth & snowfall
 
-REQUEST_SLEEP = 1.5
+REQUEST_SLEEP = 1.5  # minimum spacing between request starts, shared across threads
 ERROR_BACKOFF_EXTRA = 5.0
 MAX_LIMIT = 1000
+# season windows fetched in parallel; overlaps round trips while REQUEST_SLEEP still caps the rate
+MAX_CONCURRENT_REQUESTS = 4
+
+request_lock = threading.Lock()
+next_request_at = 0.0
 
 # STATIONS_FILE contains list of stations to grab data for. 
 # use fetch stations to get list to decide which ones you want
 STATIONS_FILE = "airport-list.txt"
 OUTPUT_DIR = "weather-data"
+OUTPUT_COLUMNS = ["station_id", "station_name", "date", "datatype", "value", "attributes"]
 
-def noaa_get(endpoint, params):
+SESSION = requests.Session()
+# optional on-disk response cache so a restarted run replays finished pages instead of refetching them
+try:
+    import requests_cache
+    # token is left out of cache keys and never written to the cache file
+    CACHED_SESSION = requests_cache.CachedSession(
+        "noaa_cache.sqlite", backend="sqlite", expire_after=None,
+        allowable_methods=("GET",), ignored_parameters=["token"])
+except Exception:
+    CACHED_SESSION = None
+
+def wait_for_request_slot():
+    """Block until REQUEST_SLEEP has passed since the previous request started in any thread."""
+    global next_request_at
+    with request_lock:
+        now = time.monotonic()
+        wait = next_request_at - now
+        next_request_at = max(now, next_request_at) + REQUEST_SLEEP
+    if wait > 0:
+        time.sleep(wait)
+
+def noaa_get(endpoint, params, use_cache=True):
     """Wrapper that handles NOAA requests with simple retry/backoff.
 
     Retries on 5xx and 429 responses. Raises for other client errors.
+    Pages already in the response cache are returned without a network request.
     """
     url = f"{BASE_URL}/{endpoint}"
     max_attempts = 5
     backoff = 2.0
 
+    session = CACHED_SESSION if use_cache and CACHED_SESSION is not None else SESSION
+    if session is CACHED_SESSION:
+        # cached pages don't count against the rate limit, so check before taking a request slot
+        response = session.get(url, headers=HEADERS, params=params, only_if_cached=True)
+        if response.status_code == 200:
+            return response.json()
+
     for attempt in range(1, max_attempts + 1):
         try:
-            response = requests.get(url, headers=HEADERS, params=params, timeout=30)
+            wait_for_request_slot()
+            response = session.get(url, headers=HEADERS, params=params, timeout=30)
 
             # successful
             if response.status_code == 200:
@@ -79,23 +117,31 @@ def noaa_get(endpoint, params):
 
 def read_station_list():
     """Read station information from airport-list.txt"""
-    df = pd.read_csv(STATIONS_FILE)
-    stations = []
-    
-    for _, row in df.iterrows():
-        stations.append({
-            "id": row["id"],
-            "name": row["name"],
-            "mindate": row["mindate"],
-            "maxdate": row["maxdate"],
-            "latitude": row["latitude"],
-            "longitude": row["longitude"],
-            "elevation": row["elevation"]
-        })
-    
-    return stations
-
-def fetch_station_season(station_id, startdate, enddate):
+    with open(STATIONS_FILE, newline='', encoding='utf-8') as f:
+        return list(csv.DictReader(f))
+
+def record_row(station_id, station_name, record):
+    """Flatten one NOAA data record into an output row in OUTPUT_COLUMNS order."""
+    value = record["value"]
+    # always written as a float ("8.0"), matching the existing weather-data files
+    return (
+        station_id,
+        station_name,
+        record["date"],
+        record["datatype"],
+        float(value) if value is not None else "",
+        record.get("attributes", ""),
+    )
+
+def write_rows(output_file, rows, mode='w'):
+    """Write rows to a station CSV, adding the header unless appending."""
+    with open(output_file, mode, newline='', encoding='utf-8') as f:
+        writer = csv.writer(f, lineterminator='\n')
+        if mode == 'w':
+            writer.writerow(OUTPUT_COLUMNS)
+        writer.writerows(rows)
+
+def fetch_station_season(station_id, startdate, enddate, use_cache=True):
     """Fetch data for a station between two dates."""
     records = []
     offset = 1
@@ -112,7 +158,7 @@ def fetch_station_season(station_id, startdate, enddate):
             "units": "standard"  # get data in standard units
         }
 
-        data = noaa_get("data", params)
+        data = noaa_get("data", params, use_cache)
         results = data.get("results", [])
 
         if not results:
@@ -122,7 +168,6 @@ def fetch_station_season(station_id, startdate, enddate):
         if offset > 1: 
             print(f"    → {len(records)} records fetched so far...")
         offset += MAX_LIMIT
-        time.sleep(REQUEST_SLEEP)
 
     return records
 
@@ -142,113 +187,103 @@ def main():
     print(f"Reading stations from {STATIONS_FILE}...")
     stations = read_station_list()
     print(f"Found {len(stations)} stations to process\n")
-    print(f"⏱️  Using {REQUEST_SLEEP}s delay between requests + {ERROR_BACKOFF_EXTRA}s after errors")
+    print(f"⏱️  Using {REQUEST_SLEEP}s delay between requests ({MAX_CONCURRENT_REQUESTS} in flight) + {ERROR_BACKOFF_EXTRA}s after errors")
     print("This will take several hours. The script can be safely stopped and restarted.\n")
 
-    for idx, station in enumerate(stations, 1):
-        station_id = station["id"]
-        station_name = station["name"]
+    # season windows only go through the pool on the full-fetch path
+    executor = None if args.append_latest else ThreadPoolExecutor(max_workers=MAX_CONCURRENT_REQUESTS)
+
+    try:
+        for idx, station in enumerate(stations, 1):
+            station_id = station["id"]
+            station_name = station["name"]
         
-        # create safe filename from station ID
-        safe_name = station_id.replace(":", "_")
-        output_file = os.path.join(OUTPUT_DIR, f"{safe_name}.csv")
+            # create safe filename from station ID
+            safe_name = station_id.replace(":", "_")
+            output_file = os.path.join(OUTPUT_DIR, f"{safe_name}.csv")
         
-        # if running in append mode, fetch only 2026-01-23 -> 2026-02-02 and append to file
-        if args.append_latest:
-            print(f"[{idx}/{len(stations)}] Appending 2026 window for: {station_id} ({station_name})")
-            try:
-                window_rows = []
-                # modify these dates to append newer data as needed
-                records = fetch_station_season(station_id, '2026-01-23', '2026-02-02')
-                for record in records:
-                    window_rows.append({
-                        "station_id": station_id,
-                        "station_name": station_name,
-                        "date": record["date"],
-                        "datatype": record["datatype"],
-                        "value": record["value"],
-                        "attributes": record.get("attributes", "")
-                    })
-
-                if window_rows:
-                    df = pd.DataFrame(window_rows)
-                    # append without header if file exists
-                    if os.path.exists(output_file):
-                        df.to_csv(output_file, index=False, header=False, mode='a')
-                        print(f"  ✓ Appended {len(window_rows)} records to {output_file}")
+            # if running in append mode, fetch only 2026-01-23 -> 2026-02-02 and append to file
+            if args.append_latest:
+                print(f"[{idx}/{len(stations)}] Appending 2026 window for: {station_id} ({station_name})")
+                try:
+                    window_rows = []
+                    # modify these dates to append newer data as needed
+                    # recent days can still be revised upstream, so this window always skips the cache
+                    records = fetch_station_season(station_id, '2026-01-23', '2026-02-02', use_cache=False)
+                    for record in records:
+                        window_rows.append(record_row(station_id, station_name, record))
+
+                    if window_rows:
+                        # append without header if file exists
+                        if os.path.exists(output_file):
+                            write_rows(output_file, window_rows, mode='a')
+                            print(f"  ✓ Appended {len(window_rows)} records to {output_file}")
+                        else:
+                            write_rows(output_file, window_rows)
+                            print(f"  ✓ Saved {len(window_rows)} records to new file {output_file}")
                     else:
-                        df.to_csv(output_file, index=False)
-                        print(f"  ✓ Saved {len(window_rows)} records to new file {output_file}")
-                else:
-                    print(f"  ⚠ No records found for {station_id} in the 2026 window")
+                        print(f"  ⚠ No records found for {station_id} in the 2026 window")
 
-            except Exception as e:
-                print(f"✗ ERROR appending {station_id}: {e}")
-                print("Continuing with next station...")
-            print()
-            continue
+                except Exception as e:
+                    print(f"✗ ERROR appending {station_id}: {e}")
+                    print("Continuing with next station...")
+                print()
+                continue
 
-        # default behavior: full seasonal fetch (existing logic)
-        # check if already processed
-        if os.path.exists(output_file):
-            print(f"[{idx}/{len(stations)}] SKIPPING {station_id} - already exists")
-            continue
+            # default behavior: full seasonal fetch (existing logic)
+            # check if already processed
+            if os.path.exists(output_file):
+                print(f"[{idx}/{len(stations)}] SKIPPING {station_id} - already exists")
+                continue
 
-        start_year = int(station["mindate"][:4])
-        end_year = int(station["maxdate"][:4])
+            start_year = int(station["mindate"][:4])
+            end_year = int(station["maxdate"][:4])
 
-        print(f"[{idx}/{len(stations)}] Processing: {station_id}")
-        print(f"  Name: {station_name}")
-        print(f"  Years: {start_year}–{end_year} ({end_year - start_year + 1} years)")
+            print(f"[{idx}/{len(stations)}] Processing: {station_id}")
+            print(f"  Name: {station_name}")
+            print(f"  Years: {start_year}–{end_year} ({end_year - start_year + 1} years)")
 
-        all_rows = []
+            all_rows = []
         
-        try:
-            # process in chunks to show progress less frequently
-            total_years = end_year - start_year + 1
+            # Jan–Mar and Oct–Dec of every year, submitted up front and collected in order
+            windows = []
             for year in range(start_year, end_year + 1):
-                years_done = year - start_year
-                if years_done % 10 == 0 or year == start_year:
-                    print(f"  Progress: {years_done}/{total_years} years ({year})")
-                
-                # Jan–Mar
-                jan_mar = fetch_station_season(
-                    station_id,
-                    f"{year}-01-01",
-                    f"{year}-03-31"
-                )
-
-                # Oct–Dec
-                oct_dec = fetch_station_season(
-                    station_id,
-                    f"{year}-10-01",
-                    f"{year}-12-31"
-                )
-
-                for record in jan_mar + oct_dec:
-                    all_rows.append({
-                        "station_id": station_id,
-                        "station_name": station_name,
-                        "date": record["date"],
-                        "datatype": record["datatype"],
-                        "value": record["value"],
-                        "attributes": record.get("attributes", "")
-                    })
-
-            # save station data
-            if all_rows:
-                df = pd.DataFrame(all_rows)
-                df.to_csv(output_file, index=False)
-                print(f"  ✓ Saved {len(all_rows)} records to {output_file}")
-            else:
-                print(f"  ⚠ No data found for {station_id}")
+                windows.append((f"{year}-01-01", f"{year}-03-31"))
+                windows.append((f"{year}-10-01", f"{year}-12-31"))
+            futures = [executor.submit(fetch_station_season, station_id, start, end) for start, end in windows]
+
+            try:
+                # process in chunks to show progress less frequently
+                total_years = end_year - start_year + 1
+                for i, future in enumerate(futures):
+                    year = start_year + i // 2
+                    years_done = year - start_year
+                    if i % 2 == 0 and (years_done % 10 == 0 or year == start_year):
+                        print(f"  Progress: {years_done}/{total_years} years ({year})")
+
+                    for record in future.result():
+                        all_rows.append(record_row(station_id, station_name, record))
+
+                # save station data
+                if all_rows:
+                    write_rows(output_file, all_rows)
+                    print(f"  ✓ Saved {len(all_rows)} records to {output_file}")
+                else:
+                    print(f"  ⚠ No data found for {station_id}")
                 
-        except Exception as e:
-            print(f"✗ ERROR processing {station_id}: {e}")
-            print("Continuing with next station...")
-            continue
+            except Exception as e:
+                # drop this station's queued windows before moving on
+                for future in futures:
+                    future.cancel()
+                print(f"✗ ERROR processing {station_id}: {e}")
+                print("Continuing with next station...")
+                continue
         
-        print()
+            print()
+    finally:
+        # on Ctrl-C or an error, drop queued windows instead of letting the exit hook fetch them
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
 
     print("\n=== ALL DONE ===")
     print(f"Weather data saved to {OUTPUT_DIR}/")
@@ -0,0 +1,46 @@
+import os
+import pickle
+import sys
+from pathlib import Path
+
+# per-directory folder holding pickled parse results next to the source CSVs
+CACHE_DIR_NAME = '.cache'
+# station files are read start to finish once, so parsers use a large read buffer
+READ_BUFFER_SIZE = 1 << 20
+
+
+def parser_stamp(parse):
+	"""Identify a parse function plus the last edit of the module that defines it."""
+	source = getattr(sys.modules.get(parse.__module__), '__file__', None)
+	return parse.__module__, parse.__qualname__, os.stat(source).st_mtime_ns if source else None
+
+
+def cached_parse(parse, path, *args):
+	"""Return parse(path, *args), reusing a pickled result while the file and parser are unchanged."""
+	path = Path(path)
+	st = path.stat()
+	stamp = (st.st_size, st.st_mtime_ns, args, parser_stamp(parse))
+	cache_path = path.parent / CACHE_DIR_NAME / f'{path.name}.{parse.__name__}.pickle'
+	try:
+		with cache_path.open('rb') as fh:
+			cached_stamp, result = pickle.load(fh)
+		if cached_stamp == stamp:
+			return result
+	except (OSError, EOFError, ValueError, pickle.UnpicklingError):
+		pass
+
+	result = parse(path, *args)
+	# write then rename so an interrupted run never leaves a truncated cache file
+	tmp_path = cache_path.with_name(cache_path.name + '.tmp')
+	try:
+		cache_path.parent.mkdir(exist_ok=True)
+		with tmp_path.open('wb') as fh:
+			pickle.dump((stamp, result), fh, protocol=pickle.HIGHEST_PROTOCOL)
+		os.replace(tmp_path, cache_path)
+	except OSError:
+		# the cache is only an optimization; a read-only or full data dir must not fail the run
+		try:
+			tmp_path.unlink()
+		except OSError:
+			pass
+	return result
@@ -1,3 +1,4 @@
+from functools import lru_cache
 from pathlib import Path
 import csv
 
@@ -6,6 +7,8 @@ OUT_DIR = Path("split")
 TYPES = {"SNOW", "SNWD", "TMAX", "TMIN", "PRCP"}
 
 
+# called once per row, but a dump only has a few hundred distinct names
+@lru_cache(maxsize=4096)
 def normalize_station_name(name: str) -> str:
 	return name.strip().lower().replace(' ', '-')
 
@@ -18,26 +21,40 @@ def ensure_dirs():
 
 def process_files():
 	ensure_dirs()
+	# (datatype, station) outputs that already have a header; listed once up front
+	# so existing files from an earlier run are appended to without a new header
+	seen = {(t, p.stem) for t in TYPES for p in (OUT_DIR / t.lower()).glob('*.csv')}
 	for csv_path in DATA_DIR.glob('*.csv'):
-		with csv_path.open(newline='') as fh:
-			reader = csv.reader(fh)
-			for row in reader:
-				if not row:
-					continue
-				if len(row) < 6:
-					continue
-				station_id, station_name, date, datatype, value, attributes = row[:6]
-				if datatype not in TYPES:
-					continue
-				norm = normalize_station_name(station_name)
-				out_dir = OUT_DIR / datatype.lower()
-				out_file = out_dir / f"{norm}.csv"
-				write_header = not out_file.exists()
-				with out_file.open('a', newline='') as outfh:
-					writer = csv.writer(outfh)
-					if write_header:
-						writer.writerow(['station_id','station_name','date','datatype','value','attributes'])
-					writer.writerow([station_id, station_name, date, datatype, value, attributes])
+		# one open writer per (datatype, station) output, kept for the whole input file
+		writers = {}
+		out_handles = []
+		try:
+			with csv_path.open(newline='') as fh:
+				reader = csv.reader(fh)
+				for row in reader:
+					if not row:
+						continue
+					if len(row) < 6:
+						continue
+					datatype = row[3]
+					if datatype not in TYPES:
+						continue
+					norm = normalize_station_name(row[1])
+					key = (datatype, norm)
+					writer = writers.get(key)
+					if writer is None:
+						out_dir = OUT_DIR / datatype.lower()
+						out_file = out_dir / f"{norm}.csv"
+						outfh = out_file.open('a', newline='')
+						out_handles.append(outfh)
+						writer = writers[key] = csv.writer(outfh)
+						if key not in seen:
+							seen.add(key)
+							writer.writerow(['station_id','station_name','date','datatype','value','attributes'])
+					writer.writerow(row if len(row) == 6 else row[:6])
+		finally:
+			for outfh in out_handles:
+				outfh.close()
 
 
 if __name__ == '__main__':